@@ -4,23 +4,13 @@
 100パターンの副菜を生成します
 """
 
-import json
-import os
-import time
-from typing import List, Dict
-from openai import OpenAI
-
-# OpenAI APIの設定
-import os
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    print("❌ Error: OPENAI_API_KEY environment variable not set")
-    exit(1)
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+from typing import Dict, List
+from generator import GenerationSpec, run
+from schemas import SideDish, SideDishBatch
 
 TOTAL_SIDE_DISHES = 100
-BATCH_SIZE = 5
+BATCH_SIZE = 20
+MAX_TOKENS_PER_ITEM = 250
 
 # 調理方法のカテゴリー
 COOKING_METHODS = [
@@ -28,20 +18,28 @@ COOKING_METHODS = [
     "揚げ物", "蒸し物", "漬物", "サラダ", "マリネ"
 ]
 
-def generate_side_dishes_batch(count: int, existing_names: List[str], existing_methods: Dict[str, int]) -> List[Dict]:
-    """副菜をバッチ生成"""
-
-    existing_names_text = ""
-    if existing_names:
-        existing_names_text = f"\n重要: 以下の副菜名とは異なるものにしてください:\n" + "\n".join([f"- {name}" for name in existing_names[-20:]])
+def count_cooking_methods(side_dishes: List[Dict]) -> Dict[str, int]:
+    """調理方法ごとの生成数を数える"""
+    existing_methods = {method: 0 for method in COOKING_METHODS}
+    for sd in side_dishes:
+        method = sd.get("cookingMethod", "その他")
+        if method in existing_methods:
+            existing_methods[method] += 1
+    return existing_methods
+
+def print_method_distribution(side_dishes: List[Dict]) -> None:
+    """調理方法の分布を表示"""
+    print(f"\n📊 Cooking method distribution:")
+    for method, count in sorted(count_cooking_methods(side_dishes).items(), key=lambda x: x[1], reverse=True):
+        print(f"  - {method}: {count} dishes")
 
-    # 調理方法のバランスを考慮
-    method_distribution = "\n調理方法のバランス（現在の生成数）:\n" + "\n".join([f"- {method}: {count}個" for method, count in existing_methods.items()])
+def format_method_distribution(side_dishes: List[Dict]) -> str:
+    """調理方法のバランスを考慮させるため、現在の生成数をプロンプト用に整形する"""
+    existing_methods = count_cooking_methods(side_dishes)
+    return "\n調理方法のバランス（現在の生成数）:\n" + "\n".join([f"- {method}: {count}個" for method, count in existing_methods.items()])
 
-    prompt = f"""
-あなたはお弁当の副菜専門家です。以下の条件で{count}個の異なる副菜を生成してください。
-{existing_names_text}
-{method_distribution}
+PROMPT_PREFIX = f"""
+あなたはお弁当の副菜専門家です。以下の条件で、異なる副菜を生成してください。
 
 各副菜には以下を含めてください:
 - 副菜の名前（魅力的で具体的なもの）
@@ -53,7 +51,7 @@ def generate_side_dishes_batch(count: int, existing_names: List[str], existing_m
 - 季節（春/夏/秋/冬、または季節を問わない場合はnull）
 
 重要な要件:
-1. {count}個すべて異なる副菜にすること
+1. すべて異なる副菜にすること
 2. 調理方法のバランスを考慮し、偏りがないようにすること
 3. 季節の食材を取り入れること（必要に応じて）
 4. 冷めても美味しい料理を選ぶこと
@@ -88,108 +86,25 @@ def generate_side_dishes_batch(count: int, existing_names: List[str], existing_m
 }}
 """
 
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            print(f"    🌐 API呼び出し中... (attempt {attempt + 1}/{max_retries})")
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "あなたはお弁当の副菜専門家です。JSON形式で副菜を生成します。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.9
-            )
-
-            print(f"    ✓ API応答受信")
-            response_text = response.choices[0].message.content.strip()
-
-            # JSONの抽出（コードブロックから取り出す）
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-
-            data = json.loads(response_text)
-            side_dishes = data.get("sideDishes", [])
-
-            if len(side_dishes) == count:
-                return side_dishes
-            else:
-                print(f"⚠️ Expected {count} side dishes, got {len(side_dishes)}. Using what we got.")
-                return side_dishes
-
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON decode error (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(3)
-                continue
-            else:
-                return []
-        except Exception as e:
-            print(f"❌ Error (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(3)
-                continue
-            else:
-                return []
-
-    return []
-
-def generate_all_side_dishes(total_count: int) -> List[Dict]:
-    """すべての副菜を生成（バッチ処理）"""
-    print(f"\n🔄 Generating {total_count} side dishes...")
-
-    all_side_dishes = []
-    existing_names = []
-    existing_methods = {method: 0 for method in COOKING_METHODS}
-
-    # バッチごとに生成
-    batches = (total_count + BATCH_SIZE - 1) // BATCH_SIZE
-    for batch_num in range(batches):
-        remaining = total_count - len(all_side_dishes)
-        batch_size = min(BATCH_SIZE, remaining)
-
-        print(f"  📝 Batch {batch_num + 1}/{batches}: Generating {batch_size} side dishes...")
-
-        batch_side_dishes = generate_side_dishes_batch(batch_size, existing_names, existing_methods)
-
-        if batch_side_dishes:
-            all_side_dishes.extend(batch_side_dishes)
-            existing_names.extend([sd.get("name", "") for sd in batch_side_dishes])
-
-            # 調理方法のカウント更新
-            for sd in batch_side_dishes:
-                method = sd.get("cookingMethod", "その他")
-                if method in existing_methods:
-                    existing_methods[method] += 1
-
-            print(f"  ✅ Total: {len(all_side_dishes)}/{total_count} side dishes generated")
-        else:
-            print(f"  ⚠️ Batch {batch_num + 1} failed, skipping...")
-
-        # API Rate Limitを避けるため少し待つ
-        time.sleep(1)
-
-    print(f"✅ Completed: {len(all_side_dishes)} side dishes")
-    print(f"\n📊 Cooking method distribution:")
-    for method, count in sorted(existing_methods.items(), key=lambda x: x[1], reverse=True):
-        print(f"  - {method}: {count} dishes")
-
-    return all_side_dishes
-
-def main():
-    """メイン処理"""
-    side_dishes = generate_all_side_dishes(TOTAL_SIDE_DISHES)
-
-    # 結果をJSONファイルに保存
-    output_path = "../BentoPlannerClean/PresetSideDishes.json"
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump({"sideDishes": side_dishes}, f, ensure_ascii=False, indent=2)
-
-    print(f"\n✅ Successfully generated preset side dishes!")
-    print(f"📁 Saved to: {output_path}")
-    print(f"\n📊 Summary: {len(side_dishes)} side dishes")
+SIDE_DISHES_SPEC = GenerationSpec(
+    label="side dishes",
+    system_prompt="あなたはお弁当の副菜専門家です。JSON形式で副菜を生成します。",
+    prompt_prefix=PROMPT_PREFIX,
+    item_name="副菜",
+    batch_schema=SideDishBatch,
+    item_schema=SideDish,
+    result_key="sideDishes",
+    output_path="../BentoPlannerClean/PresetSideDishes.json",
+    ndjson_path="PresetSideDishes.partial.ndjson",
+    categories={"sideDishes": {"name": "副菜", "description": "お弁当の副菜"}},
+    total_count=TOTAL_SIDE_DISHES,
+    batch_size=BATCH_SIZE,
+    temperature=0.9,
+    model="gpt-4o-mini",
+    max_tokens_per_item=MAX_TOKENS_PER_ITEM,
+    extra_instructions=format_method_distribution,
+    report=print_method_distribution
+)
 
 if __name__ == "__main__":
-    main()
+    run(SIDE_DISHES_SPEC, __doc__)
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+プリセットデータ生成スクリプト共通の生成処理
+GenerationSpec（プロンプト・スキーマ・出力先など）を受け取り、バッチ生成からJSONの保存までを行います
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Type
+
+import ijson
+import orjson
+from aiofiles.threadpool.binary import AsyncBufferedIOBase
+from openai import APIError, APIStatusError, RateLimitError
+from pydantic import BaseModel, ValidationError
+
+from json_stream import append_ndjson, iter_json_items, open_ndjson_for_append, read_ndjson, write_json_atomic
+from openai_client import create_client
+from rate_limiter import RateLimiter, backoff_delay, estimate_request_tokens, retry_after_delay
+from response_cache import cached_chat, set_force_refresh
+from schemas import json_schema_format
+
+# OpenAI APIの設定
+client = create_client()
+
+# 最初の応答までの仮の上限。以降は応答ヘッダーが示すアカウントの上限に従う（--rpm/--tpmで固定も可能）
+DEFAULT_MAX_REQUESTS_PER_MINUTE = 500
+DEFAULT_MAX_TOKENS_PER_MINUTE = 30000
+
+# OpenAIのレート制限はモデルごとなので、リミッターもモデルごとに分ける
+rate_limiters: Dict[str, RateLimiter] = {}
+# --rpm/--tpmで固定した上限（モデルごとのリミッターを作るときに適用する）
+fixed_limits: Dict[str, Optional[float]] = {"max_requests_per_minute": None, "max_tokens_per_minute": None}
+
+MAX_CONCURRENT_BATCHES = 8  # 同時に投げるバッチ数の上限（すべてのspec・カテゴリで共有）
+MAX_RETRIES = 3
+# 4xxのうち、時間をおけば成功しうるもの（タイムアウト・競合・レート制限）。それ以外の4xxは実行全体を止める
+RETRYABLE_CLIENT_ERROR_STATUSES = {408, 409, 429}
+RESPONSE_OVERHEAD_TOKENS = 100  # 出力のJSONの外枠（配列のキーなど）の分
+MAX_OUTPUT_TOKENS = 16384  # gpt-4o / gpt-4o-miniの出力トークン数の上限
+JSON_RETRY_TEMPERATURE = 0.2  # 壊れたJSONが返ってきたときは温度を下げて1回だけ再試行する
+MAX_AVOID_NAMES = 20  # プロンプトに「重複しないように」と渡す直近の名前の数
+STAGGER_ITEMS = 3  # 前のバッチがこの件数を受信してから次のバッチを送る（プロンプトが重ならないように）
+MAX_ROUNDS = 3  # 重複で捨てた分などの不足を補うために、カテゴリの生成をやり直す回数の上限
+
+# 複数のspecを同時に生成する場合も、同時実行数はプロセス全体で制限する
+batch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+
+# 同じ出力JSONを複数のspecが更新する場合（簡単弁当とメインディッシュ）に、読み込みから書き込みまでを直列化する
+output_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# プロンプトキャッシュの効き具合（usage.prompt_tokens_details.cached_tokens）の集計
+prompt_token_usage = {"prompt_tokens": 0, "cached_tokens": 0}
+
+
+@dataclass
+class GenerationSpec:
+    """生成対象（メインディッシュ・副菜・献立など）ごとの設定"""
+    label: str  # ログ表示用の名前（例: "main dishes"）
+    system_prompt: str
+    # リクエスト間で共通の指示とJSON形式の例。OpenAIのプロンプトキャッシュは先頭から一致する部分にだけ効くので、
+    # 毎回変わる指定（カテゴリ・生成数・避けたい名前など）はbuild_promptがこの後ろに付け足す
+    prompt_prefix: str
+    item_name: str  # プロンプト内での呼び方（例: "メインディッシュ"）
+    batch_schema: Type[BaseModel]  # response_formatに渡す応答全体のスキーマ
+    item_schema: Type[BaseModel]  # 1件分のスキーマ
+    result_key: str  # 応答JSON内の配列のキー（例: "mainDishes"）
+    output_path: str
+    ndjson_path: str  # 生成途中の結果を記録するファイル（中断後の再実行で続きから生成する）
+    categories: Dict[str, Dict]  # 出力JSONのキー -> カテゴリ情報（name, description）
+    total_count: int  # カテゴリごとの生成数
+    batch_size: int
+    temperature: float
+    # 単純な構造の料理は小さいモデルで十分なので、specごとにモデルを選べるようにする
+    model: str = "gpt-4o"
+    # 1件あたりの出力トークン数の見積もり（max_tokensとレート制限の見積もりに使う。Noneならモデルの上限まで）
+    max_tokens_per_item: Optional[int] = None
+    # 生成済みの料理から、プロンプトの末尾に付け足す指定を組み立てる（副菜の調理方法のバランスなど）
+    extra_instructions: Optional[Callable[[List[Dict]], str]] = None
+    # カテゴリの生成完了後に追加の集計を表示する場合に指定
+    report: Optional[Callable[[List[Dict]], None]] = None
+
+
+def build_prompt(spec: GenerationSpec, category_info: Dict, count: int, avoid_names: List[str], generated: List[Dict]) -> str:
+    """共通のプレフィックスに、バッチごとに変わる指定を付け足してユーザープロンプトを組み立てる"""
+    avoid_names_text = ""
+    if avoid_names:
+        avoid_names_text = f"\n重要: 以下の{spec.item_name}とは異なるものにしてください:\n" + "\n".join([f"- {name}" for name in avoid_names])
+
+    prompt = spec.prompt_prefix + f"""
+# 今回の生成内容
+カテゴリ: {category_info['name']}
+説明: {category_info['description']}
+{count}個の{spec.item_name}を生成してください。
+{avoid_names_text}
+"""
+    if spec.extra_instructions:
+        prompt += spec.extra_instructions(generated) + "\n"
+    return prompt
+
+
+def is_fatal_error(error: BaseException) -> bool:
+    """再試行しても直らないエラーか（APIキー・モデル名・リクエスト内容の誤りなど）"""
+    return (isinstance(error, APIStatusError) and 400 <= error.status_code < 500
+            and error.status_code not in RETRYABLE_CLIENT_ERROR_STATUSES)
+
+
+async def gather_or_abort(aws: Iterable[Awaitable[Any]]) -> List[Any]:
+    """同時に実行してすべての結果を返す（例外は結果として返す）
+    is_fatal_errorに当たる例外が起きた場合は、残りを取り消してその例外を送出する
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        for future in asyncio.as_completed(tasks):
+            try:
+                await future
+            except Exception as e:
+                if is_fatal_error(e):
+                    raise
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return [task.exception() or task.result() for task in tasks]
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """モデルのレートリミッターを取得する（初回は作成する）"""
+    if model not in rate_limiters:
+        limiter = RateLimiter(DEFAULT_MAX_REQUESTS_PER_MINUTE, DEFAULT_MAX_TOKENS_PER_MINUTE)
+        limiter.set_limits(**fixed_limits)
+        rate_limiters[model] = limiter
+    return rate_limiters[model]
+
+
+@cached_chat
+async def request_chat(model: str, system: str, user: str, temperature: float, response_format: Dict,
+                       max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+    """レート制限を守りながらAPIを呼び出し、応答テキストを受信した順に返す"""
+    rate_limiter = get_rate_limiter(model)
+    await rate_limiter.acquire(estimate_request_tokens(system, user, max_tokens))
+    raw_response = await client.chat.completions.with_raw_response.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        temperature=temperature,
+        response_format=response_format,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    rate_limiter.update_from_headers(raw_response.headers)
+
+    finish_reason = None
+    async for chunk in raw_response.parse():
+        if chunk.usage:
+            prompt_token_usage["prompt_tokens"] += chunk.usage.prompt_tokens
+            if chunk.usage.prompt_tokens_details:
+                prompt_token_usage["cached_tokens"] += chunk.usage.prompt_tokens_details.cached_tokens or 0
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        if choice.delta.refusal:
+            raise ValueError(f"Model refused: {choice.delta.refusal}")
+        if choice.delta.content:
+            yield choice.delta.content
+        if choice.finish_reason == "length":
+            raise ValueError("Response was truncated")
+        finish_reason = choice.finish_reason or finish_reason
+
+    # content_filterや途中で切れたストリームは不完全なJSONなので、キャッシュに保存させないよう例外にする
+    if finish_reason != "stop":
+        raise ValueError(f"Response ended with finish_reason={finish_reason}")
+
+
+async def generate_batch(spec: GenerationSpec, category_info: Dict, count: int, avoid_names: List[str],
+                         generated: List[Dict], on_item: Callable[[Dict], Awaitable[bool]], cache_slot: str) -> List[Dict]:
+    """1バッチ分を生成し、受信した順にon_itemへ渡す（on_itemがFalseを返した重複分は除く）
+    cache_slotはバッチごとに異なる値にし、2つのバッチが同じキャッシュ済みの応答を受け取らないようにする
+    """
+    prompt = build_prompt(spec, category_info, count, avoid_names, generated)
+    max_tokens = None
+    if spec.max_tokens_per_item is not None:
+        max_tokens = min(spec.max_tokens_per_item * count + RESPONSE_OVERHEAD_TOKENS, MAX_OUTPUT_TOKENS)
+
+    items = []
+    temperature = spec.temperature
+    json_retried = False
+    for attempt in range(MAX_RETRIES):
+        try:
+            print(f"    🌐 API呼び出し中... (attempt {attempt + 1}/{MAX_RETRIES})")
+            # 要素が1つ完成するたびに検証し、すぐに呼び出し元へ渡す
+            chunks = request_chat(spec.model, spec.system_prompt, prompt, temperature, cache_slot=cache_slot,
+                                  response_format=json_schema_format(spec.batch_schema), max_tokens=max_tokens)
+            async for raw_item in iter_json_items(chunks, f"{spec.result_key}.item"):
+                item = spec.item_schema.model_validate(raw_item).model_dump()
+                if await on_item(item):
+                    items.append(item)
+
+            print(f"    ✓ API応答受信")
+
+            if len(items) == count:
+                return items
+            else:
+                print(f"⚠️ Expected {count} {spec.label}, got {len(items)}. Using what we got.")
+                return items
+
+        except APIError as e:
+            if is_fatal_error(e):
+                print(f"❌ API error (not retrying): {e}")
+                raise
+            print(f"❌ API error (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+            if items:
+                # 途中まで受信できた分はそのまま使う
+                return items
+            if attempt < MAX_RETRIES - 1:
+                # 429はRetry-Afterに従い、接続エラー・タイムアウト・5xxは指数バックオフで待つ
+                if isinstance(e, RateLimitError):
+                    await asyncio.sleep(retry_after_delay(e.response.headers, attempt))
+                else:
+                    await asyncio.sleep(backoff_delay(attempt))
+                continue
+            else:
+                return []
+        except (ijson.JSONError, ValidationError) as e:
+            print(f"❌ Invalid JSON (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+            if items or json_retried:
+                return items
+            # 待たずに、温度を下げて1回だけ再試行する
+            json_retried = True
+            temperature = JSON_RETRY_TEMPERATURE
+            continue
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return items
+
+    return items
+
+
+async def generate_category(spec: GenerationSpec, category_key: str, ndjson_file: AsyncBufferedIOBase, resumed: List[Dict]) -> List[Dict]:
+    """指定されたカテゴリを生成（バッチを並列実行）"""
+    category_info = spec.categories[category_key]
+    total_count = spec.total_count
+
+    # 前回の実行で生成済みの分は重複回避に使い、残りだけを生成する
+    all_items = list(resumed)
+    seen: Set[str] = {item.get("name", "") for item in all_items}
+    if len(all_items) >= total_count:
+        print(f"\n✅ {category_info['name']}: {len(all_items)} {spec.label} already generated")
+        return all_items
+
+    print(f"\n🔄 Generating {total_count - len(all_items)} {spec.label} for {category_info['name']}...")
+
+    async def on_item(item: Dict) -> bool:
+        # 生成済みと同じ名前は捨てる（並列のバッチ同士で重なった場合も含む）
+        name = item.get("name", "")
+        if name in seen:
+            print(f"    ⚠️ Skipping duplicate: {name}")
+            return False
+        seen.add(name)
+        all_items.append(item)
+        await append_ndjson(ndjson_file, {"category": category_key, "item": item})
+        return True
+
+    async def bounded(round_num: int, batch_num: int, batches: int, batch_size: int,
+                      known: "asyncio.Future[List[Dict]]", handoff: "asyncio.Future[List[Dict]]") -> List[Dict]:
+        """1バッチを生成する（knownは前のバッチから受け取る生成済みの料理、handoffは次のバッチへ渡す分）"""
+        known_items: List[Dict] = []
+        received: List[Dict] = []
+        accepted: List[Dict] = []
+
+        def hand_off() -> None:
+            # 次のバッチには「このバッチに渡した料理 + このバッチで最初に受信した料理」を渡す
+            # 受信の進み具合によらず同じ内容になるので、キャッシュから再生した場合も同じプロンプトになる
+            if not handoff.done():
+                handoff.set_result(known_items + received[:STAGGER_ITEMS])
+
+        async def on_batch_item(item: Dict) -> bool:
+            received.append(item)
+            if len(received) >= STAGGER_ITEMS:
+                hand_off()
+            if not await on_item(item):
+                return False
+            accepted.append(item)
+            return True
+
+        fatal = False
+        try:
+            # 前のバッチの結果が届き始めてから送り、重複回避の名前がバッチごとに異なるようにする
+            known_items = await known
+            async with batch_semaphore:
+                print(f"  📝 Batch {batch_num + 1}/{batches}: Generating {batch_size} {spec.label}...")
+                # プロンプトには直近の名前だけを渡し、件数が増えてもプロンプトが伸び続けないようにする
+                avoid_names = sorted(item.get("name", "") for item in known_items[-MAX_AVOID_NAMES:])
+                batch_items = await generate_batch(spec, category_info, batch_size, avoid_names, known_items, on_batch_item,
+                                                   cache_slot=f"{category_key}/{round_num}/{batch_num}")
+        except Exception as e:
+            fatal = is_fatal_error(e)
+            raise
+        finally:
+            # 失敗した場合も後続のバッチを待たせ続けない（実行全体を止める場合は後続を送らずに取り消させる）
+            if not fatal:
+                hand_off()
+
+        if batch_items:
+            print(f"  ✅ Total: {len(all_items)}/{total_count} {spec.label} generated")
+        else:
+            print(f"  ⚠️ Batch {batch_num + 1} failed, skipping...")
+        return accepted
+
+    # 重複として捨てた分や失敗したバッチの分は、次のラウンドで不足分だけ生成し直す
+    for round_num in range(MAX_ROUNDS):
+        remaining = total_count - len(all_items)
+        if remaining <= 0:
+            break
+        if round_num > 0:
+            print(f"  🔁 Round {round_num + 1}/{MAX_ROUNDS}: {remaining} {spec.label} still missing")
+
+        round_start_items = list(all_items)
+        batches = (remaining + spec.batch_size - 1) // spec.batch_size
+        loop = asyncio.get_running_loop()
+        handoffs = [loop.create_future() for _ in range(batches + 1)]
+        handoffs[0].set_result(round_start_items)
+        tasks = [
+            bounded(round_num, i, batches, min(spec.batch_size, remaining - i * spec.batch_size), handoffs[i], handoffs[i + 1])
+            for i in range(batches)
+        ]
+        results = await gather_or_abort(tasks)
+        for batch_num, result in enumerate(results):
+            if isinstance(result, Exception):
+                print(f"  ❌ Batch {batch_num + 1} raised: {result}")
+
+        # 受信順ではなくバッチ順に並べ直し、次のラウンドのプロンプトも実行ごとに同じになるようにする
+        all_items[:] = round_start_items + [item for result in results if not isinstance(result, Exception) for item in result]
+        if len(all_items) == total_count - remaining:
+            # 1件も増えなければ、やり直しても同じ結果になる見込みが高い
+            break
+
+    print(f"✅ Completed {category_info['name']}: {len(all_items)} {spec.label}")
+    if spec.report:
+        spec.report(all_items)
+    return all_items
+
+
+def is_complete(spec: GenerationSpec, generated: Dict[str, List[Dict]]) -> bool:
+    """すべてのカテゴリが目標数に届いたか"""
+    return all(len(items) >= spec.total_count for items in generated.values())
+
+
+async def generate(spec: GenerationSpec) -> Dict[str, List[Dict]]:
+    """specのすべてのカテゴリを生成し、出力JSONの該当カテゴリを更新する"""
+    # 前回中断した実行の記録があれば読み込み、続きから生成する
+    resumed = {category_key: [] for category_key in spec.categories}
+    if os.path.exists(spec.ndjson_path):
+        for record in read_ndjson(spec.ndjson_path):
+            if record.get("category") in resumed:
+                resumed[record["category"]].append(record["item"])
+        print(f"♻️ Resuming from {spec.ndjson_path}: {sum(len(items) for items in resumed.values())} {spec.label} already generated")
+
+    # カテゴリ同士は独立しているので同時に生成する（同時実行数はbatch_semaphoreで制限される）
+    # 受信した料理はカテゴリ付きでNDJSONに随時追記する
+    async with open_ndjson_for_append(spec.ndjson_path) as ndjson_file:
+        results = await gather_or_abort(
+            generate_category(spec, category_key, ndjson_file, resumed[category_key]) for category_key in spec.categories
+        )
+    for category_key, result in zip(spec.categories, results):
+        if isinstance(result, Exception):
+            print(f"❌ {spec.categories[category_key]['name']} raised: {result}")
+
+    # NDJSONからカテゴリごとのJSONに変換する
+    generated = {category_key: [] for category_key in spec.categories}
+    for record in read_ndjson(spec.ndjson_path):
+        if record.get("category") in generated:
+            generated[record["category"]].append(record["item"])
+
+    async with output_locks[spec.output_path]:
+        # 既存のJSONを読み込み、生成したカテゴリのみを更新する
+        try:
+            with open(spec.output_path, "rb") as f:
+                all_categories = orjson.loads(f.read())
+        except FileNotFoundError:
+            print(f"⚠️ {spec.output_path} not found. Creating new file.")
+            all_categories = {}
+        for category_key, items in generated.items():
+            # 生成に失敗して件数が減る場合は、既存のデータを残す
+            existing = all_categories.get(category_key, [])
+            if len(items) < len(existing):
+                print(f"⚠️ {spec.categories[category_key]['name']}: only {len(items)} {spec.label} generated, keeping the existing {len(existing)}")
+                continue
+            all_categories[category_key] = items
+
+        # 結果をJSONファイルに保存（書き込み途中で中断しても既存のファイルは壊れない）
+        # 整形と書き込みは別スレッドで行い、他のspecの生成を止めない
+        await asyncio.to_thread(write_json_atomic, spec.output_path, all_categories)
+
+    # 目標数に届いたら途中経過の記録は不要。届かなければ残して再実行で補えるようにする
+    if is_complete(spec, generated):
+        os.remove(spec.ndjson_path)
+        print(f"\n✅ Successfully generated preset {spec.label}!")
+    else:
+        print(f"\n⚠️ Some categories are incomplete. Re-run to resume from {spec.ndjson_path}")
+    print(f"📁 Saved to: {spec.output_path}")
+    print(f"\n📊 Summary:")
+    for category_key, items in generated.items():
+        print(f"  - {spec.categories[category_key]['name']}: {len(items)} {spec.label}")
+    if prompt_token_usage["prompt_tokens"]:
+        print(f"  - Prompt cache: {prompt_token_usage['cached_tokens']}/{prompt_token_usage['prompt_tokens']} prompt tokens cached")
+
+    return generated
+
+
+def parse_args(description: str) -> argparse.Namespace:
+    """生成スクリプト共通のコマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--force-refresh", action="store_true", help="キャッシュを使わずにAPIを呼び直す")
+    parser.add_argument("--model", help="specのモデルを上書きする（モデル間の出力の比較用）")
+    parser.add_argument("--rpm", type=float, help="1分あたりのリクエスト数の上限（指定しなければ応答ヘッダーの上限に従う）")
+    parser.add_argument("--tpm", type=float, help="1分あたりのトークン数の上限（指定しなければ応答ヘッダーの上限に従う）")
+    args = parser.parse_args()
+    set_force_refresh(args.force_refresh)
+    fixed_limits.update(max_requests_per_minute=args.rpm, max_tokens_per_minute=args.tpm)
+    return args
+
+
+def run(spec: GenerationSpec, description: Optional[str] = None) -> None:
+    """コマンドラインから1つのspecを生成する"""
+    run_all([spec], description)
+
+
+def run_all(specs: List[GenerationSpec], description: Optional[str] = None) -> None:
+    """コマンドラインから複数のspecを同時に生成する（クライアント・レート制限・キャッシュを共有）"""
+    args = parse_args(description)
+    if args.model:
+        specs = [replace(spec, model=args.model) for spec in specs]
+
+    async def main():
+        # 終了時にコネクションプールを閉じる
+        async with client:
+            results = await gather_or_abort(generate(spec) for spec in specs)
+        failed = False
+        for spec, result in zip(specs, results):
+            if isinstance(result, Exception):
+                print(f"❌ Failed to generate {spec.label}: {result}")
+                failed = True
+            elif not is_complete(spec, result):
+                # 目標数に届かなかった場合も、再実行が必要なことが分かるように失敗として終了する
+                failed = True
+        return failed
+
+    try:
+        failed = asyncio.run(main())
+    except APIStatusError as e:
+        # gather_or_abortから送出されるのはis_fatal_errorに当たるものだけ
+        # 出力JSONは更新しない。生成済みの分は途中経過の記録から再実行時に再開できる
+        print(f"\n❌ Aborted: {e}")
+        sys.exit(1)
+    if failed:
+        sys.exit(1)
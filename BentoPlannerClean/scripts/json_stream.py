@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+ストリーミング応答のJSONを逐次パースし、NDJSONとして書き出すユーティリティ
+応答の受信完了を待たずに、配列の要素を1つずつ取り出して処理できます
+"""
+
+import asyncio
+import glob
+import os
+from typing import AsyncIterator, Dict, List
+
+import aiofiles
+import ijson
+import orjson
+from aiofiles.base import AiofilesContextManager
+from aiofiles.threadpool.binary import AsyncBufferedIOBase
+
+
+async def iter_json_items(chunks: AsyncIterator[str], prefix: str) -> AsyncIterator[Dict]:
+    """テキストのチャンク列から、prefixで指定した配列要素を完成した順に返す"""
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, prefix, use_float=True)
+
+    async for chunk in chunks:
+        parser.send(chunk.encode("utf-8"))
+        for item in items:
+            yield item
+        del items[:]
+
+    parser.close()
+    for item in items:
+        yield item
+
+
+def open_ndjson_for_append(path: str) -> AiofilesContextManager:
+    """NDJSONファイルを非同期の追記モードで開く（中断で末尾の行が途切れていれば改行を補う）"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(path, "ab") as f:
+                f.write(b"\n")
+    return aiofiles.open(path, "ab")
+
+
+async def append_ndjson(f: AsyncBufferedIOBase, record: Dict) -> None:
+    """1レコードをNDJSONの1行として追記し、ディスクまで書き出す（書き込み中も他のバッチの受信は止めない）"""
+    await f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+    await f.flush()
+    await asyncio.to_thread(os.fsync, f.fileno())
+
+
+def read_ndjson(path: str) -> List[Dict]:
+    """NDJSONファイルを読み込む（中断で書きかけになった行は無視する）"""
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                continue
+    return records
+
+
+def write_json_atomic(path: str, data: Dict) -> None:
+    """一時ファイルに書き出してから置き換え、途中で中断しても元のファイルを壊さない
+    出力先はXcodeがフォルダごとアプリに含めるので、一時ファイルは隠しファイルにし、失敗時や次回の書き込み時に必ず消す
+    """
+    directory = os.path.dirname(path) or "."
+    tmp_prefix = f".{os.path.basename(path)}."
+    # 前回の実行が強制終了して残った一時ファイルを片付ける
+    for stale_path in glob.glob(os.path.join(glob.escape(directory), glob.escape(tmp_prefix) + "*.tmp")):
+        os.remove(stale_path)
+
+    tmp_path = os.path.join(directory, f"{tmp_prefix}{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            # orjsonは非ASCII文字をエスケープしない（ensure_ascii=Falseと同じ）
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+生成スクリプト共通のOpenAI APIクライアントを作成するユーティリティ
+並列実行でコネクションプールが詰まらないよう、HTTP/2と大きめのプールで接続を使い回します
+（依存パッケージは `pip install -r requirements.txt` でまとめてインストールできます）
+"""
+
+import os
+
+import httpx
+from openai import AsyncOpenAI
+
+# 接続先はOpenAI APIの1ホストだけなので、同時接続数を大きめに取る
+MAX_CONNECTIONS = 1000
+MAX_KEEPALIVE_CONNECTIONS = 200
+
+
+def create_client() -> AsyncOpenAI:
+    """HTTP/2・keep-alive付きのAsyncOpenAIクライアントを作成"""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        print("❌ Error: OPENAI_API_KEY environment variable not set")
+        exit(1)
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    # 再試行はgenerate_batchでエラーの種類ごとに行うので、SDK内部の自動再試行（既定で2回）は無効にする
+    return AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
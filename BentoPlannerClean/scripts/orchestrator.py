@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+すべてのプリセットデータを1つのプロセスでまとめて生成するスクリプト
+メインディッシュ・簡単弁当・副菜・献立を同時に生成し、APIクライアントとレート制限を共有します
+"""
+
+from dataclasses import replace
+from gen_simple import SIMPLE_SPEC
+from generate_main_dishes import MAIN_DISHES_SPEC
+from generate_preset_recipes import RECIPES_SPEC
+from generate_side_dishes import SIDE_DISHES_SPEC
+from generator import run_all
+
+# 簡単弁当のメインディッシュはgen_simple.pyの専用プロンプトで生成する
+# 途中経過の記録は単体実行のgenerate_main_dishes.pyとは別のファイルにし、互いの記録を消さないようにする
+MAIN_DISHES_EXCEPT_SIMPLE_SPEC = replace(
+    MAIN_DISHES_SPEC,
+    categories={key: info for key, info in MAIN_DISHES_SPEC.categories.items() if key != "simple"},
+    ndjson_path="PresetMainDishes.orchestrator.partial.ndjson"
+)
+
+ALL_SPECS = [SIMPLE_SPEC, MAIN_DISHES_EXCEPT_SIMPLE_SPEC, SIDE_DISHES_SPEC, RECIPES_SPEC]
+
+if __name__ == "__main__":
+    run_all(ALL_SPECS, __doc__)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+OpenAI APIのレート制限（RPM/TPM）に合わせてリクエストを調整するユーティリティ
+固定のsleepではなく、トークンバケットで空き容量があるときだけ送信します
+"""
+
+import asyncio
+import random
+import time
+from typing import Mapping, Optional
+
+# tiktokenのエンコーディングは初回の見積もり時に読み込む
+_encoding = None
+_encoding_loaded = False
+
+# max_tokensを指定しない場合に見込む出力トークン数
+DEFAULT_OUTPUT_TOKENS = 4096
+
+
+def _get_encoding():
+    """tiktokenのエンコーディングを取得する（使えなければNone）"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # 未インストールの場合のほか、オフラインで初回のBPEファイルをダウンロードできない場合もある
+            _encoding = None
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """テキストのトークン数を見積もる（tiktokenが使えない場合は文字数で代用）"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # 日本語は概ね1文字1トークン前後なので、文字数を上限寄りの見積もりとして使う
+    return len(text)
+
+
+def estimate_request_tokens(system: str, prompt: str, max_tokens: Optional[int] = None) -> int:
+    """1リクエストで消費するトークン数（入力 + 出力上限）を見積もる"""
+    output_tokens = max_tokens if max_tokens is not None else DEFAULT_OUTPUT_TOKENS
+    return estimate_tokens(system) + estimate_tokens(prompt) + output_tokens
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """リトライ待ち時間（decorrelated jitter付きの指数バックオフ）"""
+    return random.uniform(base, min(cap, base * 3 ** attempt))
+
+
+def retry_after_delay(headers: Mapping[str, str], attempt: int) -> float:
+    """429応答の待ち時間（Retry-Afterヘッダーがあればそれに従い、重ならないよう少しずらす）"""
+    try:
+        if headers.get("retry-after-ms") is not None:
+            delay = float(headers["retry-after-ms"]) / 1000.0
+        elif headers.get("retry-after") is not None:
+            delay = float(headers["retry-after"])
+        else:
+            return backoff_delay(attempt)
+    except ValueError:
+        # 日時形式など想定外のヘッダーは無視する
+        return backoff_delay(attempt)
+    return delay + random.uniform(0, 1.0)
+
+
+class RateLimiter:
+    """リクエスト数とトークン数の2つのバケットで送信ペースを制御する"""
+
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        # Falseの間は、応答ヘッダーのx-ratelimit-limit-*（アカウントの実際の上限）で上限を置き換える
+        self.fixed_request_limit = False
+        self.fixed_token_limit = False
+        self.available_request_capacity = float(max_requests_per_minute)
+        self.available_token_capacity = float(max_tokens_per_minute)
+        self.last_update_time = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_limits(self, max_requests_per_minute: Optional[float] = None, max_tokens_per_minute: Optional[float] = None) -> None:
+        """上限を固定する（指定した方は応答ヘッダーの上限で置き換えない）"""
+        if max_requests_per_minute is not None:
+            self.max_requests_per_minute = max_requests_per_minute
+            self.available_request_capacity = min(self.available_request_capacity, max_requests_per_minute)
+            self.fixed_request_limit = True
+        if max_tokens_per_minute is not None:
+            self.max_tokens_per_minute = max_tokens_per_minute
+            self.available_token_capacity = min(self.available_token_capacity, max_tokens_per_minute)
+            self.fixed_token_limit = True
+
+    def _refill(self) -> None:
+        """経過時間に応じてバケットを補充する"""
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.last_update_time = now
+
+        self.available_request_capacity = min(
+            self.available_request_capacity + elapsed * self.max_requests_per_minute / 60.0,
+            self.max_requests_per_minute,
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + elapsed * self.max_tokens_per_minute / 60.0,
+            self.max_tokens_per_minute,
+        )
+
+    async def acquire(self, token_cost: int) -> None:
+        """両方のバケットに空きができるまで待ってから容量を消費する"""
+        # 1分あたりの上限を超えるリクエストは永遠に待つことになるので上限で丸める
+        token_cost = min(token_cost, self.max_tokens_per_minute)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= token_cost:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= token_cost
+                    return
+
+                # 足りない方のバケットが埋まるまでの時間だけ待つ
+                request_wait = (1 - self.available_request_capacity) * 60.0 / self.max_requests_per_minute
+                token_wait = (token_cost - self.available_token_capacity) * 60.0 / self.max_tokens_per_minute
+                await asyncio.sleep(max(request_wait, token_wait, 0.01))
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """レスポンスヘッダーの上限・残り容量に合わせてバケットを補正する"""
+        limit_requests = headers.get("x-ratelimit-limit-requests")
+        limit_tokens = headers.get("x-ratelimit-limit-tokens")
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+
+        self._refill()
+        try:
+            if limit_requests is not None and not self.fixed_request_limit:
+                self.max_requests_per_minute = float(limit_requests)
+            if limit_tokens is not None and not self.fixed_token_limit:
+                self.max_tokens_per_minute = float(limit_tokens)
+            if remaining_requests is not None:
+                self.available_request_capacity = min(self.available_request_capacity, float(remaining_requests))
+            if remaining_tokens is not None:
+                self.available_token_capacity = min(self.available_token_capacity, float(remaining_tokens))
+        except ValueError:
+            # 想定外の形式のヘッダーは無視する
+            pass
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+OpenAI APIの応答をSQLiteにキャッシュするユーティリティ
+同じ（モデル, 温度, プロンプト, 出力スキーマなどのパラメータ, バッチの枠）での再実行ではAPIを呼ばずに応答を返します
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import orjson
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache.sqlite3")
+
+# 読み書きはasyncio.to_threadのワーカースレッドで行うので、スレッドをまたいで1つの接続をロック付きで共有する
+_connection = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+_connection_lock = threading.Lock()
+_connection.execute("PRAGMA journal_mode=WAL")
+_connection.execute("CREATE TABLE IF NOT EXISTS cache(key TEXT PRIMARY KEY, response TEXT)")
+_connection.commit()
+
+# --force-refresh 指定時はキャッシュを読まずに必ずAPIを呼ぶ（結果は保存する）
+_force_refresh = False
+
+
+def set_force_refresh(enabled: bool) -> None:
+    """キャッシュを無視してAPIを呼び直すかどうかを設定"""
+    global _force_refresh
+    _force_refresh = enabled
+
+
+def cache_key(model: str, system: str, user: str, temperature: float, params: Dict, slot: str = "") -> str:
+    """キャッシュのキーを生成（paramsにはresponse_formatやmax_tokensなど、応答を左右する残りの引数を渡す）"""
+    params_json = orjson.dumps(params, option=orjson.OPT_SORT_KEYS).decode()
+    return hashlib.sha256(f"{model}|{temperature}|{slot}|{params_json}|{system}|{user}".encode()).hexdigest()
+
+
+def lookup(key: str) -> Optional[str]:
+    """キャッシュ済みの応答を取得（無ければNone）"""
+    with _connection_lock:
+        row = _connection.execute("SELECT response FROM cache WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def store(key: str, response: str) -> None:
+    """応答をキャッシュに保存"""
+    with _connection_lock:
+        _connection.execute("INSERT OR REPLACE INTO cache(key, response) VALUES (?, ?)", (key, response))
+        _connection.commit()
+
+
+def cached_chat(fetch: Callable[..., AsyncIterator[str]]) -> Callable[..., AsyncIterator[str]]:
+    """fetch(model, system, user, temperature, **kwargs) が返すストリーミング応答をキャッシュするデコレータ
+    kwargs（response_formatなど）はキーに含めてfetchにそのまま渡す。スキーマを変えると古い応答は使われない
+    cache_slotはfetchには渡さず、同じプロンプトを別々のバッチとして送る場合に応答を区別するために使う
+    """
+
+    @functools.wraps(fetch)
+    async def wrapper(model: str, system: str, user: str, temperature: float, cache_slot: str = "", **kwargs) -> AsyncIterator[str]:
+        key = cache_key(model, system, user, temperature, kwargs, cache_slot)
+        if not _force_refresh:
+            cached = await asyncio.to_thread(lookup, key)
+            if cached is not None:
+                yield cached
+                return
+
+        # 受信したチャンクはそのまま流し、最後まで受信できてJSONとして読める応答だけを保存する
+        chunks = []
+        async for chunk in fetch(model, system, user, temperature, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        response = "".join(chunks)
+        try:
+            orjson.loads(response)
+        except orjson.JSONDecodeError:
+            return
+        # commitのディスク書き込みでイベントループを止めないよう、別スレッドで保存する
+        await asyncio.to_thread(store, key, response)
+
+    return wrapper
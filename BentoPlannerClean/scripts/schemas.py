@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+生成スクリプトで使う応答スキーマ定義
+OpenAIのStructured Outputs（response_format=json_schema）に渡し、応答の検証にも使います
+"""
+
+from typing import Dict, List, Optional, Type
+from pydantic import BaseModel, ConfigDict
+
+
+class StrictModel(BaseModel):
+    """Structured Outputsのstrictモードに合わせ、未定義のフィールドを許可しない"""
+    model_config = ConfigDict(extra="forbid")
+
+
+class Dish(StrictModel):
+    name: str
+    ingredients: List[str]
+    instructions: List[str]
+
+
+class MainDish(StrictModel):
+    name: str
+    description: str
+    dish: Dish
+    prepTime: int
+    calories: int
+    difficulty: str
+    season: Optional[str]
+
+
+class MainDishBatch(StrictModel):
+    mainDishes: List[MainDish]
+
+
+class SideDish(StrictModel):
+    name: str
+    dish: Dish
+    prepTime: int
+    calories: int
+    cookingMethod: str
+    season: Optional[str]
+
+
+class SideDishBatch(StrictModel):
+    sideDishes: List[SideDish]
+
+
+class Recipe(StrictModel):
+    name: str
+    description: str
+    mainDish: Dish
+    sideDish1: Dish
+    sideDish2: Dish
+    prepTime: int
+    calories: int
+    difficulty: str
+    tips: List[str]
+
+
+class RecipeBatch(StrictModel):
+    recipes: List[Recipe]
+
+
+def json_schema_format(schema: Type[BaseModel]) -> Dict:
+    """pydanticモデルからchat.completionsのresponse_formatを生成"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema.__name__,
+            "strict": True,
+            "schema": schema.model_json_schema(),
+        },
+    }
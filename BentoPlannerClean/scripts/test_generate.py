@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
 import os
+import re
 from openai import OpenAI
 
 # OpenAI APIの設定
@@ -11,6 +12,9 @@ if not OPENAI_API_KEY:
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# ```json ... ``` のコードブロックで囲まれた応答からJSON部分を取り出す（後ろに説明文が続く場合も含む）
+FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*\})\s*```', re.DOTALL)
+
 prompt = '''
 お弁当レシピを2個生成してください。以下のJSON形式で出力してください:
 
@@ -56,10 +60,9 @@ response = client.chat.completions.create(
 print('Response received')
 response_text = response.choices[0].message.content.strip()
 
-if '```json' in response_text:
-    response_text = response_text.split('```json')[1].split('```')[0].strip()
-elif '```' in response_text:
-    response_text = response_text.split('```')[1].split('```')[0].strip()
+match = FENCE_RE.search(response_text)
+if match:
+    response_text = match.group(1)
 
 data = json.loads(response_text)
 print(f'Generated {len(data.get("recipes", []))} recipes')